@@ -2,54 +2,378 @@
 """
 Simple embedding server that uses the same model as claude-memory.
 Runs on localhost:5001 and provides embeddings via HTTP.
+
+POST /embed {"text": "..."} returns {"embedding": [...]}.
+POST /embed {"texts": ["...", ...]} returns {"embeddings": [[...], ...]}.
+
+Send "Accept: application/octet-stream" to get raw little-endian float32 bytes
+instead (row-major, X-Embedding-Dim columns); add ?dtype=float16 to halve them.
+
+Concurrent requests are coalesced into a single model.encode() call so the
+transformer runs on padded, length-sorted batches instead of one text at a time.
 """
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
-import json
-from sentence_transformers import SentenceTransformer
+import math
+import os
+
+
+def physical_core_count() -> int:
+    """Cores this process may use, counting SMT siblings once.
+
+    Respects CPU affinity (cpusets) and a cgroup v2 CPU quota where available.
+    """
+    try:
+        cpus = os.sched_getaffinity(0)
+    except AttributeError:  # macOS/Windows
+        return os.cpu_count() or 1
+
+    cores = set()
+    for cpu in cpus:
+        try:
+            with open(f'/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list') as f:
+                cores.add(f.read().strip())
+        except OSError:
+            cores.add(str(cpu))
+    count = len(cores)
+
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            count = min(count, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, count)
+
+
+# Pin math-library thread pools before numpy/torch are imported (they read these once)
+NUM_THREADS = physical_core_count()
+os.environ.setdefault('OMP_NUM_THREADS', str(NUM_THREADS))
+os.environ.setdefault('MKL_NUM_THREADS', str(NUM_THREADS))
+
+import asyncio
+import hashlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import numpy as np
+import torch
+
+torch.set_num_threads(int(os.environ['OMP_NUM_THREADS']))
+torch.set_num_interop_threads(1)
+
+try:
+    import uvicorn
+    import orjson
+    from fastapi import FastAPI, HTTPException, Request, Response
+    from fastapi.middleware.cors import CORSMiddleware
+except ImportError:
+    print('Error: fastapi/uvicorn/orjson not installed. Run: pip install fastapi "uvicorn[standard]" orjson')
+    exit(1)
+
+# ONNX Runtime is optional - fall back to PyTorch sentence-transformers without it
+try:
+    import onnxruntime as ort
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+    HAS_ONNX = True
+except ImportError:
+    HAS_ONNX = False
+
+MODEL_NAME = 'sentence-transformers/all-mpnet-base-v2'
+MAX_SEQ_LENGTH = 384  # same truncation as the sentence-transformers model
+EMBEDDING_DIM = 768
+ONNX_CACHE_DIR = Path.home() / '.cache' / 'claude-memory-visualizer' / 'onnx'
+
+MAX_BATCH_SIZE = 1024  # texts coalesced from concurrent requests per encode() call
+ENCODE_BATCH_SIZE = 32  # texts per forward pass - bounds padded activation memory
+MAX_BATCH_WAIT = 0.005  # seconds to wait for more requests before encoding
+CACHE_SIZE = 100_000  # embeddings kept in memory (~3KB each)
+
+
+class OnnxEncoder:
+    """Drop-in for SentenceTransformer.encode() backed by an ONNX Runtime session.
+
+    Tokenizes length-sorted batches, mean-pools token embeddings over the
+    attention mask and optionally L2-normalizes, matching all-mpnet-base-v2.
+    """
+
+    def __init__(self, model_dir: Path, file_name: str):
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session_options.intra_op_num_threads = int(os.environ['OMP_NUM_THREADS'])
+        session_options.inter_op_num_threads = 1
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            model_dir,
+            file_name=file_name,
+            provider='CPUExecutionProvider',
+            session_options=session_options,
+        )
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False, **kwargs):
+        # Sort by length so each batch pads to a similar size
+        order = np.argsort([-len(text) for text in texts])
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(
+                [texts[i] for i in order[start:start + batch_size]],
+                padding=True,
+                truncation=True,
+                max_length=MAX_SEQ_LENGTH,
+                return_tensors='np',
+            )
+            hidden = self.model(
+                input_ids=inputs['input_ids'],
+                attention_mask=inputs['attention_mask'],
+            ).last_hidden_state
+
+            mask = inputs['attention_mask'][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if normalize_embeddings:
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            chunks.append(pooled.astype(np.float32))
+
+        embeddings = np.empty((len(texts), chunks[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.concatenate(chunks)
+        return embeddings
+
+
+def load_onnx_model() -> OnnxEncoder:
+    """Export and int8-quantize the model on first run, then load it from cache.
+
+    Graph optimizations (attention/layernorm fusion etc.) are applied by the
+    ORT session at load time (ORT_ENABLE_ALL); optimum's offline O1-O4 passes
+    don't support the mpnet architecture.
+    """
+    exported_dir = ONNX_CACHE_DIR / 'exported'
+    quantized_dir = ONNX_CACHE_DIR / 'quantized'
+    if not (exported_dir / 'model.onnx').exists():
+        print("Exporting model to ONNX (first run only)...")
+        exported = ORTModelForFeatureExtraction.from_pretrained(
+            MODEL_NAME, export=True, provider='CPUExecutionProvider'
+        )
+        exported.save_pretrained(exported_dir)
+        AutoTokenizer.from_pretrained(MODEL_NAME).save_pretrained(exported_dir)
+    if not (quantized_dir / 'model_quantized.onnx').exists():
+        print("Quantizing ONNX model to int8 (first run only)...")
+        # Dynamic quantization: int8 weights, activations quantized on the fly (VNNI dot products)
+        quantizer = ORTQuantizer.from_pretrained(exported_dir, file_name='model.onnx')
+        quantizer.quantize(
+            save_dir=quantized_dir,
+            quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False),
+        )
+        AutoTokenizer.from_pretrained(exported_dir).save_pretrained(quantized_dir)
+    return OnnxEncoder(quantized_dir, 'model_quantized.onnx')
+
+
+def load_torch_model():
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer('all-mpnet-base-v2')
+    # int8 dynamic quantization of the Linear layers (sbert model_quantization.py recipe)
+    model._first_module().auto_model = torch.quantization.quantize_dynamic(
+        model._first_module().auto_model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+    print("Using int8 dynamic quantization")
+    return model
+
 
 # Load model once at startup (uses cached version from ~/.cache/huggingface)
 print("Loading embedding model...")
-model = SentenceTransformer('all-mpnet-base-v2')
-print("Model loaded!")
-
-class EmbeddingHandler(BaseHTTPRequestHandler):
-    def do_OPTIONS(self):
-        """Handle CORS preflight"""
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
-
-    def do_POST(self):
-        """Handle embedding request"""
-        content_length = int(self.headers['Content-Length'])
-        body = self.rfile.read(content_length)
-        data = json.loads(body)
-
-        text = data.get('text', '')
-        if not text:
-            self.send_error(400, 'Missing text field')
-            return
-
-        # Generate embedding
-        embedding = model.encode(text, normalize_embeddings=True).tolist()
-
-        # Send response
-        self.send_response(200)
-        self.send_header('Content-Type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.end_headers()
-        self.wfile.write(json.dumps({'embedding': embedding}).encode())
-
-    def log_message(self, format, *args):
-        # Quieter logging
-        pass
+model = None
+if HAS_ONNX:
+    try:
+        model = load_onnx_model()
+        print("Model loaded! (ONNX Runtime, int8)")
+    except Exception as e:
+        print(f"ONNX Runtime setup failed ({e}), falling back to PyTorch")
+if model is None:
+    model = load_torch_model()
+    print("Model loaded! (PyTorch - pip install \"optimum[onnxruntime]\" for faster CPU inference)")
+
+
+class EmbeddingCache:
+    """LRU cache of float32 embeddings keyed by a hash of the text.
+
+    Only touched from the event loop (by the batch worker), so no lock is needed.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+    def get(self, key: bytes):
+        embedding = self.entries.get(key)
+        if embedding is not None:
+            self.entries.move_to_end(key)
+        return embedding
+
+    def put(self, key: bytes, embedding: np.ndarray) -> None:
+        self.entries[key] = embedding
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+
+embedding_cache = EmbeddingCache(CACHE_SIZE)
+
+# (texts, future) pairs waiting for the batch worker
+pending_requests: asyncio.Queue
+
+
+def encode_batch(texts):
+    return model.encode(
+        texts,
+        batch_size=ENCODE_BATCH_SIZE,
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    )
+
+
+async def encode_with_cache(texts):
+    """Encode texts, reusing cached vectors and encoding each unseen text once."""
+    keys = [EmbeddingCache.key(text) for text in texts]
+    cached = [embedding_cache.get(key) for key in keys]
+
+    # Only encode texts we haven't seen (deduplicated within the batch too)
+    missing = {}
+    for key, text, embedding in zip(keys, texts, cached):
+        if embedding is None:
+            missing.setdefault(key, text)
+
+    encoded = {}
+    if missing:
+        # Run the forward pass off the event loop so new requests keep queueing
+        vectors = await asyncio.to_thread(encode_batch, list(missing.values()))
+        for key, vector in zip(missing, vectors):
+            # Copy so a cached row doesn't keep the whole batch array alive
+            encoded[key] = vector.copy()
+            embedding_cache.put(key, encoded[key])
+
+    return np.stack([
+        embedding if embedding is not None else encoded[key]
+        for key, embedding in zip(keys, cached)
+    ])
+
+
+async def batch_worker():
+    """Pop queued requests, encode them together, resolve each future with its slice."""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await pending_requests.get()]
+        batch_size = len(batch[0][0])
+        deadline = loop.time() + MAX_BATCH_WAIT
+
+        while batch_size < MAX_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                texts, future = await asyncio.wait_for(pending_requests.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append((texts, future))
+            batch_size += len(texts)
+
+        try:
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            embeddings = await encode_with_cache(texts)
+
+            offset = 0
+            for request_texts, future in batch:
+                if not future.done():
+                    future.set_result(embeddings[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+        except Exception as e:
+            # Fail this batch's requests but keep the worker alive for the next one
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+
+async def encode(texts):
+    """Queue texts for the batch worker and wait until they're encoded."""
+    future = asyncio.get_running_loop().create_future()
+    await pending_requests.put((texts, future))
+    return await future
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global pending_requests
+    pending_requests = asyncio.Queue()
+    worker = asyncio.create_task(batch_worker())
+    yield
+    worker.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=['*'],
+    allow_methods=['POST', 'OPTIONS'],
+    allow_headers=['Content-Type'],
+    expose_headers=['X-Embedding-Dim', 'X-Embedding-Dtype'],
+)
+
+BINARY_DTYPES = {'float32': np.dtype('<f4'), 'float16': np.dtype('<f2')}
+
+
+def json_response(content: dict) -> Response:
+    return Response(orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY), media_type='application/json')
+
+
+def binary_response(embeddings: np.ndarray, dtype: str) -> Response:
+    return Response(
+        embeddings.astype(BINARY_DTYPES[dtype]).tobytes(),
+        media_type='application/octet-stream',
+        headers={'X-Embedding-Dim': str(embeddings.shape[-1]), 'X-Embedding-Dtype': dtype},
+    )
+
+
+@app.post('/embed')
+async def embed(request: Request, dtype: str = 'float32'):
+    """Handle embedding request (single text or a list of texts)"""
+    binary = 'application/octet-stream' in request.headers.get('accept', '')
+    if dtype not in BINARY_DTYPES:
+        raise HTTPException(status_code=400, detail='dtype must be float32 or float16')
+
+    try:
+        data = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail='Invalid JSON body')
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail='Expected a JSON object')
+
+    if 'texts' in data:
+        texts = data['texts']
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            raise HTTPException(status_code=400, detail='texts must be a list of strings')
+        embeddings = await encode(texts) if texts else np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        if binary:
+            return binary_response(embeddings, dtype)
+        return json_response({'embeddings': embeddings})
+
+    text = data.get('text')
+    if not text or not isinstance(text, str):
+        raise HTTPException(status_code=400, detail='Missing text field')
+    embedding = (await encode([text]))[0]
+    if binary:
+        return binary_response(embedding, dtype)
+    return json_response({'embedding': embedding})
+
 
 if __name__ == '__main__':
     port = 5001
-    server = HTTPServer(('localhost', port), EmbeddingHandler)
     print(f"Embedding server running on http://localhost:{port}")
     print("Using model: all-mpnet-base-v2 (same as claude-memory)")
-    server.serve_forever()
+    # 'auto' picks uvloop/httptools when installed (uvicorn[standard]), else asyncio/h11
+    uvicorn.run(app, host='localhost', port=port, loop='auto', http='auto', log_level='warning')
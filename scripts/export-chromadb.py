@@ -5,16 +5,21 @@ Export ChromaDB embeddings to JSON for Claude Memory Visualizer.
 Includes pre-computed 3D projections (UMAP, t-SNE, PCA) for instant visualization.
 
 Usage:
-    python export-chromadb.py [--output FILE] [--limit N]
+    python export-chromadb.py [--output FILE] [--limit N] [--embedding-format {full,none,quantized}]
 
 Examples:
     python export-chromadb.py
     python export-chromadb.py --output my-data.json --limit 1000
+    python export-chromadb.py --embedding-format quantized
 """
 
 import argparse
-import json
+import base64
+import math
+import multiprocessing as mp
 import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 import numpy as np
@@ -25,67 +30,223 @@ except ImportError:
     print("Error: chromadb not installed. Run: pip install chromadb")
     exit(1)
 
+try:
+    import orjson
+except ImportError:
+    print("Error: orjson not installed. Run: pip install orjson")
+    exit(1)
+
+# Optional Intel-optimized scikit-learn - must patch before sklearn estimators are imported
+try:
+    from sklearnex import patch_sklearn
+    patch_sklearn()
+except ImportError:
+    pass
+
 try:
     from sklearn.decomposition import PCA
     from sklearn.manifold import TSNE
+    from threadpoolctl import threadpool_limits
 except ImportError:
     print("Error: scikit-learn not installed. Run: pip install scikit-learn")
     exit(1)
 
 try:
+    import numba
     import umap
 except ImportError:
     print("Error: umap-learn not installed. Run: pip install umap-learn")
     exit(1)
 
+# Optional multithreaded t-SNE (openTSNE) - much faster than sklearn's TSNE
+try:
+    import openTSNE
+    HAS_OPENTSNE = True
+except ImportError:
+    HAS_OPENTSNE = False
 
-def compute_projections(embeddings: np.ndarray) -> dict:
-    """Compute 3D projections using UMAP, t-SNE, and PCA."""
+# Optional GPU acceleration (RAPIDS cuML) - used for PCA and UMAP when available
+try:
+    import cupy
+    from cuml import PCA as cuPCA
+    from cuml import UMAP as cuUMAP
+    HAS_CUML = True
+except ImportError:
+    HAS_CUML = False
 
-    n_samples = len(embeddings)
-    print(f"Computing projections for {n_samples} documents...")
 
-    projections = {}
+UMAP_N_NEIGHBORS = 15
+
+
+def available_cpus() -> int:
+    """CPUs this process may use, respecting affinity and a cgroup v2 CPU quota."""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS/Windows
+        count = os.cpu_count() or 1
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            count = min(count, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, count)
 
-    # PCA (fastest)
+
+def tsne_perplexity(n_samples: int) -> int:
+    """Adjust perplexity for smaller datasets."""
+    return min(30, max(5, n_samples // 5))
+
+
+def pca_job(embeddings: np.ndarray, n_threads: int) -> np.ndarray:
+    """PCA (fastest)."""
     print("  Computing PCA...")
-    pca = PCA(n_components=3, random_state=42)
-    pca_result = pca.fit_transform(embeddings)
-    projections["pca"] = normalize_projection(pca_result)
-    print("  PCA done.")
+    if HAS_CUML:
+        pca = cuPCA(n_components=3, random_state=42)
+        pca_result = cupy.asnumpy(pca.fit_transform(cupy.asarray(embeddings, dtype=cupy.float32)))
+    else:
+        pca = PCA(n_components=3, svd_solver="randomized", random_state=42, n_oversamples=10)
+        pca_result = pca.fit_transform(embeddings)
+    return normalize_projection(pca_result)
+
 
-    # UMAP (good balance)
+def umap_job(embeddings: np.ndarray, n_threads: int) -> np.ndarray:
+    """UMAP (good balance)."""
     print("  Computing UMAP...")
-    umap_model = umap.UMAP(
+    umap_params = dict(
         n_components=3,
-        n_neighbors=15,
+        n_neighbors=UMAP_N_NEIGHBORS,
         min_dist=0.1,
-        metric="cosine",
+        metric="euclidean",  # equivalent to cosine on L2-normalized input, but faster
         random_state=42,
     )
-    umap_result = umap_model.fit_transform(embeddings)
-    projections["umap"] = normalize_projection(umap_result)
-    print("  UMAP done.")
+    if HAS_CUML:
+        gpu_embeddings = cupy.asarray(embeddings, dtype=cupy.float32)
+        umap_result = cupy.asnumpy(cuUMAP(**umap_params).fit_transform(gpu_embeddings))
+    else:
+        umap_result = umap.UMAP(**umap_params).fit_transform(embeddings)
+    return normalize_projection(umap_result)
+
 
-    # t-SNE (slowest but good clusters)
+def tsne_job(embeddings: np.ndarray, n_threads: int) -> np.ndarray:
+    """t-SNE (slowest but good clusters) - stays on CPU, cuML's TSNE only supports 2D."""
     print("  Computing t-SNE (this may take a while)...")
-    # Adjust perplexity for smaller datasets
-    perplexity = min(30, max(5, n_samples // 5))
-    tsne = TSNE(
-        n_components=3,
-        perplexity=perplexity,
+    perplexity = tsne_perplexity(len(embeddings))
+    # Reduce to 50 dims first - neighbor search dominates t-SNE cost in high dimensions
+    tsne_input = PCA(
+        n_components=min(50, *embeddings.shape),
+        svd_solver="randomized",
         random_state=42,
-        max_iter=1000,
-    )
-    tsne_result = tsne.fit_transform(embeddings)
-    projections["tsne"] = normalize_projection(tsne_result)
-    print("  t-SNE done.")
+    ).fit_transform(embeddings)
+    if HAS_OPENTSNE:
+        # FFT interpolation (FIt-SNE) only supports up to 2 dimensions, so 3D uses Barnes-Hut
+        tsne = openTSNE.TSNE(
+            n_components=3,
+            perplexity=perplexity,
+            n_iter=1000,
+            neighbors="annoy",
+            negative_gradient_method="bh",
+            initialization="pca",
+            n_jobs=n_threads,
+            random_state=42,
+        )
+        tsne_result = np.asarray(tsne.fit(tsne_input))
+    else:
+        tsne = TSNE(
+            n_components=3,
+            perplexity=perplexity,
+            init="pca",
+            random_state=42,
+            max_iter=1000,
+            n_jobs=n_threads,
+        )
+        tsne_result = tsne.fit_transform(tsne_input)
+    return normalize_projection(tsne_result)
+
+
+PROJECTION_JOBS = {"pca": pca_job, "umap": umap_job, "tsne": tsne_job}
+PROJECTION_LABELS = {"pca": "PCA", "umap": "UMAP", "tsne": "t-SNE"}
+
+
+def run_projection_job(name: str, tmp_dir: str, shape: tuple, n_threads: int) -> np.ndarray:
+    """Worker entry point: map the shared embeddings file and run one projection.
+
+    BLAS/OpenMP and numba pools are capped at n_threads so the concurrent
+    workers share the cores instead of each claiming all of them.
+    """
+    numba.set_num_threads(min(n_threads, numba.config.NUMBA_NUM_THREADS))
+    # Copy-on-write mapping: the file is shared, nothing is pickled or copied up front
+    embeddings = np.memmap(os.path.join(tmp_dir, "embeddings.f32"), dtype=np.float32, mode="c", shape=shape)
+    with threadpool_limits(limits=n_threads):
+        return PROJECTION_JOBS[name](embeddings, n_threads)
+
+
+def l2_normalize(embeddings: np.ndarray) -> None:
+    """L2-normalize rows in place (zero vectors are left as-is)."""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    embeddings /= norms
 
-    return projections
 
+# Below this many documents, spawning workers (each re-imports chromadb, umap,
+# sklearn, ...) costs more than running the three projections one after another
+PARALLEL_MIN_SAMPLES = 2_000
 
-def normalize_projection(points: np.ndarray, scale: float = 40.0) -> list:
-    """Normalize projection to [-scale/2, scale/2] range and convert to list."""
+
+def compute_projections(embeddings: np.ndarray) -> dict:
+    """Compute 3D projections using UMAP, t-SNE, and PCA.
+
+    Projections run on an L2-normalized copy, leaving the caller's (exported)
+    vectors untouched. The three projections are independent, so with enough
+    documents and cores each runs in its own process reading a shared memmap.
+    """
+
+    n_samples = len(embeddings)
+    print(f"Computing projections for {n_samples} documents...")
+    if HAS_CUML:
+        print("  Using cuML (GPU) for PCA and UMAP")
+
+    cpus = available_cpus()
+    projections = {}
+
+    if n_samples < PARALLEL_MIN_SAMPLES or cpus < len(PROJECTION_JOBS):
+        normalized = np.array(embeddings, dtype=np.float32)
+        l2_normalize(normalized)
+        for name, job in PROJECTION_JOBS.items():
+            with threadpool_limits(limits=cpus):
+                projections[name] = job(normalized, cpus)
+            print(f"  {PROJECTION_LABELS[name]} done.")
+        return projections
+
+    n_threads = cpus // len(PROJECTION_JOBS)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        shared = np.memmap(os.path.join(tmp_dir, "embeddings.f32"), dtype=np.float32, mode="w+", shape=embeddings.shape)
+        shared[:] = embeddings
+        l2_normalize(shared)
+        shared.flush()
+        del shared
+
+        # spawn: the memmap already avoids pickling the embeddings, and forking a
+        # multithreaded parent (chromadb, numba pools) or a CUDA context is unsafe
+        with ProcessPoolExecutor(max_workers=len(PROJECTION_JOBS), mp_context=mp.get_context("spawn")) as pool:
+            futures = {
+                pool.submit(run_projection_job, name, tmp_dir, embeddings.shape, n_threads): name
+                for name in PROJECTION_JOBS
+            }
+
+            for future in as_completed(futures):
+                name = futures[future]
+                projections[name] = future.result()
+                print(f"  {PROJECTION_LABELS[name]} done.")
+
+    return {name: projections[name] for name in PROJECTION_JOBS}
+
+
+def normalize_projection(points: np.ndarray, scale: float = 40.0) -> np.ndarray:
+    """Normalize projection to [-scale/2, scale/2] range as float32."""
     # Center and scale
     min_vals = points.min(axis=0)
     max_vals = points.max(axis=0)
@@ -95,7 +256,108 @@ def normalize_projection(points: np.ndarray, scale: float = 40.0) -> list:
     normalized = (points - min_vals) / ranges - 0.5  # Center at 0
     normalized *= scale
 
-    return normalized.tolist()
+    return normalized.astype(np.float32)
+
+
+def quantize_embeddings(embeddings: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Quantize each vector to int8 with its own scale (value ~= q * scale)."""
+    if len(embeddings) == 0:
+        return np.empty((0, 0), dtype=np.int8), np.empty(0, dtype=np.float32)
+    scales = np.abs(embeddings).max(axis=1) / 127
+    scales[scales == 0] = 1
+    quantized = np.round(embeddings / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def write_output(
+    output_path: Path,
+    metadata: dict,
+    ids: list,
+    documents: list,
+    metadatas: list,
+    embeddings: np.ndarray,
+    projections: dict | None,
+    embedding_format: str = "quantized",
+) -> None:
+    """Stream the export JSON document by document instead of building it in memory.
+
+    embedding_format controls the per-document embedding: "full" float
+    lists, "quantized" base64 int8 bytes plus a per-vector scale, or "none".
+    """
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    if embedding_format == "quantized":
+        quantized, scales = quantize_embeddings(embeddings)
+
+    with open(output_path, "wb") as f:
+        f.write(b'{"metadata":')
+        f.write(orjson.dumps(metadata, option=option))
+        f.write(b',"documents":[')
+        for i in range(len(ids)):
+            if i > 0:
+                f.write(b",")
+            document = {
+                "id": ids[i],
+                "text": documents[i] if i < len(documents) else "",
+            }
+            if embedding_format == "full":
+                document["embedding"] = embeddings[i] if i < len(embeddings) else []
+            elif embedding_format == "quantized":
+                document["embedding_q8"] = base64.b64encode(quantized[i].tobytes()).decode() if i < len(quantized) else ""
+                document["scale"] = float(scales[i]) if i < len(scales) else 1.0
+            document["metadata"] = metadatas[i] if i < len(metadatas) else {}
+            f.write(orjson.dumps(document, option=option))
+        f.write(b"]")
+        if projections is not None:
+            f.write(b',"projections":')
+            f.write(orjson.dumps(projections, option=option))
+        f.write(b"}")
+
+
+FETCH_PAGE_SIZE = 10_000
+
+
+def fetch_collection(collection, limit: int | None = None) -> tuple[list, list, list, np.ndarray]:
+    """Read ids, documents, metadatas and embeddings from ChromaDB page by page.
+
+    Embeddings are copied straight into one preallocated float32 array, so
+    the whole collection is never held as Python lists.
+    """
+    total = collection.count()
+    if limit:
+        total = min(total, limit)
+
+    ids, documents, metadatas = [], [], []
+    embeddings = None
+    offset = 0
+    while offset < total:
+        batch = collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=min(FETCH_PAGE_SIZE, total - offset),
+            offset=offset,
+        )
+        n = len(batch["ids"])
+        if n == 0:
+            break
+
+        batch_embeddings = batch.get("embeddings")
+        if batch_embeddings is None:
+            batch_embeddings = []
+        if embeddings is None:
+            # Dimension from the first embedding (handles numpy arrays and lists)
+            dim = len(batch_embeddings[0]) if len(batch_embeddings) > 0 else 0
+            embeddings = np.zeros((total, dim), dtype=np.float32)
+        if len(batch_embeddings) > 0:
+            embeddings[offset:offset + n] = batch_embeddings
+
+        ids.extend(batch["ids"])
+        documents.extend(batch.get("documents") or [""] * n)
+        metadatas.extend(batch.get("metadatas") or [{}] * n)
+        offset += n
+        print(f"  Fetched {offset}/{total} documents")
+
+    if embeddings is None:
+        embeddings = np.empty((0, 0), dtype=np.float32)
+    return ids, documents, metadatas, embeddings[:offset]
 
 
 def export_chromadb(
@@ -104,8 +366,15 @@ def export_chromadb(
     output_file: str = "public/data/claude-memory.json",
     limit: int | None = None,
     skip_projections: bool = False,
+    embedding_format: str | None = None,
 ) -> None:
-    """Export ChromaDB collection to JSON for visualization."""
+    """Export ChromaDB collection to JSON for visualization.
+
+    embedding_format defaults to "none" (raw vectors go to a float16
+    side-car file) when projections are computed, else "quantized".
+    """
+    if embedding_format is None:
+        embedding_format = "quantized" if skip_projections else "none"
 
     print(f"Connecting to ChromaDB at {chroma_path}...")
     client = chromadb.PersistentClient(path=chroma_path)
@@ -119,55 +388,22 @@ def export_chromadb(
 
     print(f"Found collection '{collection_name}' with {collection.count()} documents")
 
-    # Get all data with embeddings
-    if limit:
-        data = collection.get(
-            include=["embeddings", "documents", "metadatas"],
-            limit=limit,
-        )
-    else:
-        data = collection.get(include=["embeddings", "documents", "metadatas"])
+    ids, documents, metadatas, embeddings_array = fetch_collection(collection, limit)
+    print(f"Exporting {len(ids)} documents...")
 
-    print(f"Exporting {len(data['ids'])} documents...")
+    embedding_dim = embeddings_array.shape[1]
 
-    # Get embedding dimension from first embedding (handle numpy arrays)
-    embeddings = data.get("embeddings")
-    if embeddings is None:
-        embeddings = []
-    documents = data.get("documents")
-    if documents is None:
-        documents = []
-    metadatas = data.get("metadatas")
-    if metadatas is None:
-        metadatas = []
-
-    embedding_dim = len(embeddings[0]) if len(embeddings) > 0 else 0
-
-    # Convert to numpy array for projection computation
-    embeddings_array = np.array(embeddings)
-
-    # Build output structure
-    output = {
-        "metadata": {
-            "name": "Claude Memory",
-            "embedding_model": "sentence-transformers/all-mpnet-base-v2",
-            "embedding_dim": embedding_dim,
-            "count": len(data["ids"]),
-        },
-        "documents": [
-            {
-                "id": data["ids"][i],
-                "text": documents[i] if i < len(documents) else "",
-                "embedding": [float(x) for x in embeddings[i]] if i < len(embeddings) else [],
-                "metadata": metadatas[i] if i < len(metadatas) else {},
-            }
-            for i in range(len(data["ids"]))
-        ],
+    metadata = {
+        "name": "Claude Memory",
+        "embedding_model": "sentence-transformers/all-mpnet-base-v2",
+        "embedding_dim": embedding_dim,
+        "count": len(ids),
     }
 
     # Compute projections
-    if not skip_projections and len(embeddings) > 0:
-        output["projections"] = compute_projections(embeddings_array)
+    projections = None
+    if not skip_projections and len(embeddings_array) > 0:
+        projections = compute_projections(embeddings_array)
     else:
         print("Skipping projection computation.")
 
@@ -175,8 +411,24 @@ def export_chromadb(
     output_path = Path(output_file)
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    with open(output_path, "w") as f:
-        json.dump(output, f)
+    if embedding_format == "none":
+        # Only the 3D projections are needed to render; keep raw vectors in a compact side-car
+        sidecar_path = output_path.with_suffix(".embeddings.bin")
+        embeddings_array.astype("<f2").tofile(sidecar_path)
+        metadata["embeddings_file"] = sidecar_path.name
+        metadata["embeddings_dtype"] = "float16"
+        print(f"Wrote embeddings to {sidecar_path}")
+
+    write_output(
+        output_path,
+        metadata,
+        ids,
+        documents,
+        metadatas,
+        embeddings_array,
+        projections,
+        embedding_format,
+    )
 
     file_size = output_path.stat().st_size / (1024 * 1024)
     print(f"Exported to {output_file} ({file_size:.1f} MB)")
@@ -212,8 +464,17 @@ def main():
         action="store_true",
         help="Skip computing projections (faster export)",
     )
+    parser.add_argument(
+        "--embedding-format",
+        choices=["full", "none", "quantized"],
+        default=None,
+        help="Per-document embeddings: full floats, int8 quantized, or none (float16 side-car file). "
+        "Default: none, or quantized with --skip-projections",
+    )
 
     args = parser.parse_args()
+    if args.embedding_format == "none" and args.skip_projections:
+        parser.error("--embedding-format none needs projections; drop --skip-projections")
 
     export_chromadb(
         chroma_path=args.chroma_path,
@@ -221,6 +482,7 @@ def main():
         output_file=args.output,
         limit=args.limit,
         skip_projections=args.skip_projections,
+        embedding_format=args.embedding_format,
     )
 
 
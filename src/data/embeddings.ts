@@ -0,0 +1,62 @@
+// Decoding of compact embedding formats written by the export script
+
+import type { DataSet } from '../types';
+
+// Decode base64 int8 embeddings (value = q * scale) into plain vectors, in place
+export function decodeQuantizedEmbeddings(data: DataSet): void {
+  for (const doc of data.documents) {
+    if (doc.embedding_q8 === undefined) continue;
+
+    const binary = atob(doc.embedding_q8);
+    const values = new Int8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+      values[i] = binary.charCodeAt(i); // wraps 128-255 to negative int8
+    }
+
+    const scale = doc.scale ?? 1;
+    doc.embedding = Array.from(values, (v) => v * scale);
+    delete doc.embedding_q8;
+    delete doc.scale;
+  }
+}
+
+// Convert an IEEE 754 half-precision bit pattern to a number
+function halfToFloat(bits: number): number {
+  const sign = bits & 0x8000 ? -1 : 1;
+  const exponent = (bits >> 10) & 0x1f;
+  const fraction = bits & 0x3ff;
+
+  if (exponent === 0) return sign * 2 ** -14 * (fraction / 1024); // subnormal
+  if (exponent === 0x1f) return fraction ? NaN : sign * Infinity;
+  return sign * 2 ** (exponent - 15) * (1 + fraction / 1024);
+}
+
+// Load float16 side-car embeddings (--embedding-format none) into documents
+export async function loadSidecarEmbeddings(dataUrl: string, data: DataSet): Promise<void> {
+  const file = data.metadata.embeddings_file;
+  if (!file) return;
+
+  const dim = data.metadata.embedding_dim;
+  try {
+    const response = await fetch(new URL(file, new URL(dataUrl, window.location.href)));
+    if (!response.ok) return;
+
+    const buffer = await response.arrayBuffer();
+    // Guards against the dev server's HTML fallback for missing files
+    if (buffer.byteLength !== data.documents.length * dim * 2) {
+      console.warn('Embeddings file size mismatch, semantic search disabled:', file);
+      return;
+    }
+
+    const halves = new Uint16Array(buffer);
+    data.documents.forEach((doc, i) => {
+      const embedding = new Array<number>(dim);
+      for (let j = 0; j < dim; j++) {
+        embedding[j] = halfToFloat(halves[i * dim + j] ?? 0);
+      }
+      doc.embedding = embedding;
+    });
+  } catch (err) {
+    console.error('Failed to load embeddings:', err);
+  }
+}
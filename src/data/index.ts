@@ -1,4 +1,5 @@
 // Data module - re-exports
 
 export * from './loader';
+export * from './embeddings';
 export * from './projection';
@@ -3,6 +3,7 @@
 import { state } from '../state';
 import { initEmbedder } from '../embedding';
 import { computeProjection } from './projection';
+import { decodeQuantizedEmbeddings, loadSidecarEmbeddings } from './embeddings';
 import type { DataSet, ProjectionAlgorithm } from '../types';
 
 type LoadingCallback = (message: string) => void;
@@ -22,9 +23,14 @@ export async function loadData(
   try {
     const response = await fetch(url);
     const json = (await response.json()) as DataSet;
+    decodeQuantizedEmbeddings(json);
 
     state.data = json;
 
+    // Raw vectors for semantic search aren't needed to render - fetch them alongside
+    const sidecar = loadSidecarEmbeddings(url, json);
+    state.embeddingsLoading = json.metadata.embeddings_file ? sidecar : null;
+
     // Initialize embedder (checks local server, falls back to browser)
     initEmbedder(onSearchStatus);
 
@@ -33,6 +39,11 @@ export async function loadData(
 
     // Notify about loaded data AFTER projection (legend needs timeRange)
     onStats?.(json);
+
+    await sidecar;
+    if (state.embeddingsLoading === sidecar) {
+      state.embeddingsLoading = null;
+    }
   } catch (err) {
     console.error('Error loading data:', err);
     onLoading?.('Error loading data');
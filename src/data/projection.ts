@@ -69,7 +69,7 @@ export async function computeProjection(
   await new Promise((resolve) => setTimeout(resolve, 50));
 
   try {
-    const embeddings = state.data.documents.map((d) => d.embedding);
+    const embeddings = state.data.documents.map((d) => d.embedding ?? []);
     const matrix = druid.Matrix.from(embeddings);
 
     let result: druid.Matrix;
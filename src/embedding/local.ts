@@ -12,7 +12,7 @@ export async function checkLocalEmbed(): Promise<boolean> {
 
   try {
     // Use POST to check - server only handles POST and has CORS headers for POST
-    const response = await fetch(LOCAL_EMBED_URL, {
+    const response = await fetch(`${LOCAL_EMBED_URL}/embed`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({ text: 'test' }),
@@ -26,12 +26,15 @@ export async function checkLocalEmbed(): Promise<boolean> {
   }
 }
 
-// Get embedding from local Python server
+// Get embedding from local Python server (raw float32 bytes, no JSON parsing)
 export async function getLocalEmbedding(text: string): Promise<number[] | null> {
   try {
-    const response = await fetch(LOCAL_EMBED_URL, {
+    const response = await fetch(`${LOCAL_EMBED_URL}/embed`, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: {
+        'Content-Type': 'application/json',
+        Accept: 'application/octet-stream',
+      },
       body: JSON.stringify({ text }),
     });
 
@@ -40,8 +43,8 @@ export async function getLocalEmbedding(text: string): Promise<number[] | null>
       return null;
     }
 
-    const result = (await response.json()) as { embedding: number[] };
-    return result.embedding;
+    const buffer = await response.arrayBuffer();
+    return Array.from(new Float32Array(buffer));
   } catch (err) {
     console.error('Local embed failed:', err);
     return null;
@@ -69,11 +69,21 @@ export async function semanticSearch(
     return;
   }
 
+  // Wait for side-car embeddings rather than mistaking real data for demo data
+  if (state.embeddingsLoading) {
+    onStatus?.('Loading embeddings...', true);
+    await state.embeddingsLoading;
+  }
+
   // Check if data has real embeddings (not 3D demo coordinates)
   const embDim = state.data.documents[0]?.embedding?.length || 0;
   if (embDim < 100) {
-    // Use text search for demo data
-    onStatus?.('Text search (demo mode)');
+    // Use text search for demo data (or if the side-car file failed to load)
+    onStatus?.(
+      state.data.metadata.embeddings_file
+        ? 'Text search (embeddings unavailable)'
+        : 'Text search (demo mode)'
+    );
     fallbackTextSearch(query, onResults);
     return;
   }
@@ -88,7 +98,7 @@ export async function semanticSearch(
     const similarities: SearchMatch[] = [];
 
     for (let i = 0; i < state.data.documents.length; i++) {
-      const score = cosineSimilarity(queryEmbedding, state.data.documents[i].embedding);
+      const score = cosineSimilarity(queryEmbedding, state.data.documents[i].embedding ?? []);
       similarities.push({ index: i, score });
     }
 
@@ -8,6 +8,7 @@ import type { DataSet, TimeRange } from './types';
 export const state = {
   // Data
   data: null as DataSet | null,
+  embeddingsLoading: null as Promise<void> | null, // side-car embeddings still being fetched
   timeRange: null as TimeRange | null,
 
   // Projections
@@ -3,7 +3,11 @@
 export interface Document {
   id: string;
   text: string;
-  embedding: number[];
+  // Absent when exported with --embedding-format none (loaded from the side-car file)
+  embedding?: number[];
+  // int8-quantized export format, decoded into `embedding` on load
+  embedding_q8?: string;
+  scale?: number;
   metadata?: Record<string, unknown>;
 }
 
@@ -13,6 +17,8 @@ export interface DataSet {
     embedding_model: string;
     embedding_dim: number;
     count?: number;
+    embeddings_file?: string; // float16 side-car, relative to the JSON file
+    embeddings_dtype?: 'float16';
   };
   documents: Document[];
   projections?: {